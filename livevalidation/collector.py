@@ -0,0 +1,108 @@
+"""
+Request scoped registry of LiveValidation objects
+
+When several forms on one page are validated, each ``live_validate`` tag would
+normally emit its own script block. In collect mode the tags register their
+LiveValidation objects here instead and a single combined script is emitted
+by ``{% live_validate_scripts %}`` or the ``LiveValidationMiddleware``.
+The combined script declares every distinct option object and validator only
+once and shares one try/catch helper between all of the fields.
+Only validators given with ``add`` are replayed in the combined script,
+LiveValidation objects with other commands can not be collected.
+"""
+from django.conf import settings
+
+COLLECTOR_ATTR = '_live_validation_collector'
+MIDDLEWARE = 'livevalidation.middleware.LiveValidationMiddleware'
+
+SCRIPT = """<script type="text/javascript">
+var LVO = [%(options)s];
+var LVV = [%(validators)s];
+function LVfield(id, o, v){
+    try{
+        var lv = new LiveValidation(id, LVO[o]);
+        for (var i = 0; i < v.length; i++)
+            lv.add(LVV[v[i]][0], LVV[v[i]][1]);
+        return lv;
+    }catch(e){}
+}
+
+%(fields)s
+
+%(extra)s
+</script>"""
+
+class ValidationCollector:
+    """
+    Collects LiveValidation objects and extra scripts from every validated form
+    """
+    def __init__(self):
+        self.pending = []
+        self.extra = []
+        self.seen = set()
+
+    def add(self, lvs, extra=''):
+        """
+        Registers the LiveValidation objects of a form along with its extra script.
+        Fields which were already registered (eg. the same form included twice) are skipped
+        """
+        for lv in lvs:
+            if len(lv.commands) != len(lv.validators) + 1:
+                raise ValueError('Only add() can be collected, render LV%s inline instead'%lv.element)
+            if lv.element in self.seen:
+                continue
+            self.seen.add(lv.element)
+            self.pending.append(lv)
+        if extra and not extra in self.extra:
+            self.extra.append(extra)
+
+    def __nonzero__(self):
+        return bool(self.pending or self.extra)
+
+    def render(self):
+        """
+        Returns the combined script for everything registered since the last render
+        """
+        if not self:
+            return ''
+        options, validators, fields = [], [], []
+        for lv in self.pending:
+            if not lv.options in options:
+                options.append(lv.options)
+            indexes = []
+            for v in lv.validators:
+                if not v in validators:
+                    validators.append(v)
+                indexes.append(str(validators.index(v)))
+            fields.append("var LV%s = LVfield('%s', %d, [%s]);"%\
+                          (lv.element,lv.id,options.index(lv.options),','.join(indexes)))
+        extra = ['try{%s}catch(e){}'%e for e in self.extra]
+        self.pending, self.extra = [], []
+        return SCRIPT%{
+            'options': ',\n    '.join(options),
+            'validators': ',\n    '.join(['[%s]'%v for v in validators]),
+            'fields': '\n'.join(fields),
+            'extra': '\n'.join(extra),
+        }
+
+def can_collect(context):
+    """
+    Forms collected without a request in the context are invisible to
+    LiveValidationMiddleware, so they have to be rendered inline when it is installed
+    """
+    if context.get('request', None) is not None:
+        return True
+    return not MIDDLEWARE in settings.MIDDLEWARE_CLASSES
+
+def get_collector(context):
+    """
+    Finds (or creates) the collector for the current request.
+    It lives on the request when one is available in the context,
+    otherwise on the context itself so that every block and include shares it
+    """
+    owner = context.get('request', None)
+    if owner is None:
+        owner = context
+    if not hasattr(owner, COLLECTOR_ATTR):
+        setattr(owner, COLLECTOR_ATTR, ValidationCollector())
+    return getattr(owner, COLLECTOR_ATTR)
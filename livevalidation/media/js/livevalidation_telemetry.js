@@ -0,0 +1,83 @@
+/*
+ * Validation telemetry for django-livevalidation
+ *
+ * Records which validator a watched LiveValidation field failed (or that it passed)
+ * and sends the events in batches with navigator.sendBeacon.
+ * Only changes in a field's state are recorded so typing does not flood the queue.
+ * Load it after livevalidation_standalone.compressed.js and set LVTelemetry.url.
+ */
+var LVTelemetry = {
+    url: null,
+    batchSize: 20,
+    queue: [],
+
+    watch: function(fields, formClass, signatures){
+        for (var i = 0; i < fields.length; i++){
+            if (fields[i]){
+                fields[i].lvFormClass = formClass;
+                fields[i].lvSignature = signatures[i];
+            }
+        }
+    },
+
+    validatorName: function(type){
+        for (var name in Validate){
+            if (Validate[name] === type)
+                return name;
+        }
+        return '';
+    },
+
+    record: function(lv, valid){
+        var name = valid ? '' : LVTelemetry.validatorName(lv.lvFailed);
+        if (lv.lvLast === name)
+            return;
+        lv.lvLast = name;
+        LVTelemetry.queue.push({c: lv.lvFormClass, f: lv.element.id, v: name, s: lv.lvSignature, ok: valid ? 1 : 0});
+        if (LVTelemetry.queue.length >= LVTelemetry.batchSize)
+            LVTelemetry.flush();
+    },
+
+    flush: function(){
+        if (!LVTelemetry.url || !LVTelemetry.queue.length)
+            return;
+        var data = JSON.stringify(LVTelemetry.queue);
+        LVTelemetry.queue = [];
+        if (navigator.sendBeacon && navigator.sendBeacon(LVTelemetry.url, data))
+            return;
+        try{
+            var xhr = new XMLHttpRequest();
+            xhr.open('POST', LVTelemetry.url, true);
+            xhr.setRequestHeader('Content-Type', 'text/plain;charset=UTF-8');
+            xhr.send(data);
+        }catch(e){}
+    }
+};
+
+(function(){
+    var validateElement = LiveValidation.prototype.validateElement;
+    LiveValidation.prototype.validateElement = function(type, params){
+        var valid = validateElement.call(this, type, params);
+        if (!valid)
+            this.lvFailed = type;
+        return valid;
+    };
+
+    var validate = LiveValidation.prototype.validate;
+    LiveValidation.prototype.validate = function(){
+        this.lvFailed = null;
+        var valid = validate.call(this);
+        if (this.lvFormClass && !this.element.disabled)
+            LVTelemetry.record(this, valid);
+        return valid;
+    };
+
+    var hidden = function(){
+        if (document.visibilityState == 'hidden')
+            LVTelemetry.flush();
+    };
+    if (window.addEventListener){
+        window.addEventListener('pagehide', LVTelemetry.flush, false);
+        document.addEventListener('visibilitychange', hidden, false);
+    }
+})();
@@ -0,0 +1,22 @@
+from django.utils.encoding import smart_str
+
+from livevalidation.collector import COLLECTOR_ATTR
+
+class LiveValidationMiddleware(object):
+    """
+    Inserts the combined LiveValidation script of collected forms before the closing body tag.
+    Only forms which were not already emitted by ``{% live_validate_scripts %}`` are included.
+    Requires ``django.core.context_processors.request`` so the tags can reach the request
+    """
+    def process_response(self, request, response):
+        collector = getattr(request, COLLECTOR_ATTR, None)
+        if not collector or not 'text/html' in response.get('Content-Type', ''):
+            return response
+        content = response.content
+        index = content.lower().rfind('</body>')
+        if index == -1:
+            return response
+        response.content = content[:index] + smart_str(collector.render()) + content[index:]
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        return response
@@ -95,4 +95,24 @@ LV%(fieldname)s.form.onsubmit = function(){
         return true;
     return false;
 }
-""")
\ No newline at end of file
+""")
+
+# Collect the javascript of every live_validate tag on a page instead of emitting it inline
+# The combined script is rendered by {% live_validate_scripts %} or LiveValidationMiddleware
+# Can be overridden per tag with collect=True or collect=False
+LV_COLLECT = getattr(settings,'LV_COLLECT',False)
+
+
+# Validation telemetry, see livevalidation/telemetry.py
+# When enabled the generated LiveValidation objects are watched by livevalidation_telemetry.js
+LV_TELEMETRY = getattr(settings,'LV_TELEMETRY',False)
+# Count in the cache, shared by every process, instead of only in this process
+LV_TELEMETRY_CACHE = getattr(settings,'LV_TELEMETRY_CACHE',False)
+# Seconds between bulk writes of the counts to the cache
+LV_TELEMETRY_FLUSH = getattr(settings,'LV_TELEMETRY_FLUSH',60)
+# Maximum number of events accepted in one request
+LV_TELEMETRY_BATCH = getattr(settings,'LV_TELEMETRY_BATCH',100)
+# Maximum number of distinct (form class, field, validator) keys counted
+LV_TELEMETRY_MAX_KEYS = getattr(settings,'LV_TELEMETRY_MAX_KEYS',1000)
+# Seconds the counts are kept in the cache, 30 days is the longest memcached allows
+LV_TELEMETRY_TIMEOUT = getattr(settings,'LV_TELEMETRY_TIMEOUT',60*60*24*30)
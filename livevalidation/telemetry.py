@@ -0,0 +1,227 @@
+"""
+Server side aggregation of validation telemetry
+
+Events sent by livevalidation_telemetry.js are counted in memory per
+(form class, field id, validator) as [failures, successes].
+Every event carries the signature the template tag gave its form class and field,
+so only fields which were actually rendered can be counted.
+At most LV_TELEMETRY_MAX_KEYS distinct keys are kept, events for new keys beyond that are dropped.
+
+When LV_TELEMETRY_CACHE is set the counts are added to counters in the cache
+every LV_TELEMETRY_FLUSH seconds instead of on every request. Each key has its own
+counters which are only changed with ``incr``, so processes never overwrite each other.
+The keys are listed in LV_TELEMETRY_MAX_KEYS slots, claimed with ``add`` starting at a
+slot picked by the hash of the key. Every flush registers its keys again if their slot
+expired and refreshes the timeout of their slots.
+"""
+from threading import Lock
+from time import time
+
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac, constant_time_compare
+from django.utils.encoding import smart_str
+from django.utils.hashcompat import md5_constructor
+
+from livevalidation import settings
+
+CACHE_KEY = 'livevalidation.telemetry'
+MAX_LENGTH = 100
+RESULTS = ('failed', 'passed')
+VALIDATORS = ('Presence', 'Format', 'Numericality', 'Length', 'Inclusion',
+              'Exclusion', 'Acceptance', 'Confirmation', 'Email', 'Custom')
+
+_lock = Lock()
+_counts = {}
+_last_flush = [time()]
+
+def _merge(target, counts, limit=None):
+    for key,(failed,passed) in counts.items():
+        if not key in target and limit is not None and len(target) >= limit:
+            continue
+        total = target.setdefault(key, [0, 0])
+        total[0] += failed
+        total[1] += passed
+    return target
+
+def _hash(key):
+    return md5_constructor(repr(key)).hexdigest()
+
+def _counter(key, result):
+    return '%s.%s.%s'%(CACHE_KEY, _hash(key), result)
+
+def _slot(index):
+    return '%s.slot.%d'%(CACHE_KEY, index)
+
+def _slots():
+    return [_slot(i) for i in range(settings.LV_TELEMETRY_MAX_KEYS)]
+
+def sign(form_class, field):
+    """
+    Returns the signature the client has to send along with events of the field
+    """
+    value = '%s:%s'%(smart_str(form_class), smart_str(field))
+    return salted_hmac(CACHE_KEY, value).hexdigest()[:16]
+
+def clean(event):
+    """
+    Returns the (form class, field id, validator) key and the [failures, successes]
+    of an event posted by the client. Raises ValueError or TypeError for anything else
+
+        >>> s = sign('UserChangeForm', 'id_username')
+        >>> clean({'c': u'UserChangeForm', 'f': u'id_username', 'v': u'Format', 's': s, 'ok': 0})
+        (('UserChangeForm', 'id_username', 'Format'), (1, 0))
+        >>> clean({'c': u'UserChangeForm', 'f': u'id_password', 'v': u'Format', 's': s, 'ok': 0})
+        Traceback (most recent call last):
+        ...
+        ValueError: Invalid signature
+    """
+    values = []
+    for name in ('c', 'f', 'v', 's'):
+        value = event[name]
+        if not isinstance(value, basestring):
+            raise TypeError('%s must be a string'%name)
+        value = smart_str(value)
+        if len(value) > MAX_LENGTH:
+            raise ValueError('%s is longer than %d'%(name, MAX_LENGTH))
+        values.append(value)
+    form_class, field, validator, signature = values
+    if validator and not validator in VALIDATORS:
+        raise ValueError('Unknown validator %r'%validator)
+    if not event['ok'] in (0, 1):
+        raise ValueError('ok must be 0 or 1')
+    if not constant_time_compare(sign(form_class, field), signature):
+        raise ValueError('Invalid signature')
+    return (form_class, field, validator), event['ok'] and (0, 1) or (1, 0)
+
+def record(events):
+    """
+    Counts a batch of events already cleaned by ``clean``
+    """
+    batch = {}
+    for key,count in events:
+        _merge(batch, {key: count})
+    _lock.acquire()
+    try:
+        _merge(_counts, batch, settings.LV_TELEMETRY_MAX_KEYS)
+        due = settings.LV_TELEMETRY_CACHE and \
+            time() - _last_flush[0] >= settings.LV_TELEMETRY_FLUSH
+    finally:
+        _lock.release()
+    if due:
+        flush()
+
+def _register(key, index, timeout):
+    """
+    Claims a free slot for the key, index maps the known slots to their keys
+    """
+    size = settings.LV_TELEMETRY_MAX_KEYS
+    start = int(_hash(key), 16)%size
+    for i in range(size):
+        name = _slot((start + i)%size)
+        if not name in index:
+            if cache.add(name, key, timeout):
+                index[name] = key
+                return True
+            # claimed by another process in the meantime
+            index[name] = cache.get(name)
+        if index[name] == key:
+            return True
+    return False
+
+def _incr(name, delta, timeout):
+    try:
+        cache.incr(name, delta)
+    except ValueError:
+        # the counter expired or was evicted
+        cache.add(name, 0, timeout)
+        cache.incr(name, delta)
+
+def _write(counts):
+    """
+    Adds the counts to the cache, removing every key from counts once it is written
+    """
+    timeout = settings.LV_TELEMETRY_TIMEOUT
+    index = cache.get_many(_slots())
+    indexed = set(index.values())
+    for key in counts.keys():
+        if not key in indexed and not _register(key, index, timeout):
+            # every slot is taken
+            del counts[key]
+    cache.set_many(dict([(name, key) for name,key in index.items() if key in counts]), timeout)
+    names = [_counter(key, result) for key in counts for result in RESULTS]
+    existing = cache.get_many(names)
+    for name in names:
+        if not name in existing:
+            cache.add(name, 0, timeout)
+    for key in counts.keys():
+        total = counts[key]
+        for i,result in enumerate(RESULTS):
+            if total[i]:
+                _incr(_counter(key, result), total[i], timeout)
+                total[i] = 0
+        del counts[key]
+
+def flush():
+    """
+    Adds the in memory counts to the counters in the cache and resets them.
+    Whatever could not be written is kept for the next flush
+    """
+    _lock.acquire()
+    try:
+        counts = _counts.copy()
+        _counts.clear()
+        _last_flush[0] = time()
+    finally:
+        _lock.release()
+    try:
+        _write(counts)
+    finally:
+        _lock.acquire()
+        try:
+            _merge(_counts, counts, settings.LV_TELEMETRY_MAX_KEYS)
+        finally:
+            _lock.release()
+
+def _cached_keys():
+    return set(cache.get_many(_slots()).values())
+
+def _cached_counts():
+    keys = _cached_keys()
+    values = cache.get_many([_counter(key, result) for key in keys for result in RESULTS])
+    counts = {}
+    for key in keys:
+        counts[key] = [values.get(_counter(key, result), 0) for result in RESULTS]
+    return counts
+
+def get_counts():
+    """
+    Returns the aggregated counts as {(form class, field id, validator): [failures, successes]}
+
+        >>> reset()
+        >>> s = sign('UserChangeForm', 'id_username')
+        >>> record([clean({'c': 'UserChangeForm', 'f': 'id_username', 'v': 'Format', 's': s, 'ok': 0}),
+        ...         clean({'c': 'UserChangeForm', 'f': 'id_username', 'v': '', 's': s, 'ok': 1})])
+        >>> sorted(get_counts().items())
+        [(('UserChangeForm', 'id_username', ''), [0, 1]), (('UserChangeForm', 'id_username', 'Format'), [1, 0])]
+    """
+    counts = {}
+    if settings.LV_TELEMETRY_CACHE:
+        _merge(counts, _cached_counts())
+    _lock.acquire()
+    try:
+        return _merge(counts, _counts)
+    finally:
+        _lock.release()
+
+def reset():
+    """
+    Forgets all counts, both in memory and in the cache
+    """
+    _lock.acquire()
+    try:
+        _counts.clear()
+    finally:
+        _lock.release()
+    if settings.LV_TELEMETRY_CACHE:
+        cache.delete_many([_counter(key, result) for key in _cached_keys() for result in RESULTS])
+        cache.delete_many(_slots())
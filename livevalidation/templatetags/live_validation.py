@@ -1,5 +1,7 @@
 from livevalidation.validator import *
 from livevalidation.settings import *
+from livevalidation.collector import get_collector, can_collect
+from livevalidation.telemetry import sign
 from django import template
 from django.forms import fields
 
@@ -8,38 +10,64 @@ register = template.Library()
 class ValidationNode(template.Node):
     def __init__(self, form, *opts):
         self.form = form
+        self.collect = LV_COLLECT
         self.opts = {'validMessage':' '}
         for opt in opts:
             a,b = map(str,opt.split('=')[:2])
+            if a == 'collect':
+                self.collect = b.lower() in ('true','1','yes')
+                continue
             if a in ('onValid','onInvalid'):
                 b = '%s()'%b
             self.opts[a] = b
     
     def render(self, context):
         result = ['<script type="text/javascript">']
-        self.form = context[self.form]
-        self.formcls = self.form.__class__
+        form = context[self.form]
+        self.formcls = form.__class__
         try:
             # admin formset
-            fields = self.form.form.fields
-            prefix = '%s-'%self.form.prefix if self.form.form.prefix else ''
+            fields = form.form.fields
+            prefix = '%s-'%form.prefix if form.form.prefix else ''
         except AttributeError:
             try:
                 # regular form
-                fields = self.form.fields
+                fields = form.fields
             except AttributeError:
-                raise template.TemplateSyntaxError('Form %s has no fields'%self.form)
-            prefix = '%s-'%self.form.prefix if self.form.prefix else ''
-        for name,field in fields.items():
-            result.append(self.do_field('%s%s'%(prefix,name),field))
+                raise template.TemplateSyntaxError('Form %s has no fields'%form)
+            prefix = '%s-'%form.prefix if form.prefix else ''
         try:
-            result.append(LV_EXTRA_SCRIPT%{'fieldname':'id_%s'%fields.keys()[1]})
+            extra = LV_EXTRA_SCRIPT%{'fieldname':'id_%s'%fields.keys()[1]}
         except:
             return ''
+        lvs = [self.build_field('%s%s'%(prefix,name),field) for name,field in fields.items()]
+        lvs = filter(None,lvs)
+        if LV_TELEMETRY and lvs:
+            # before the extra script, which may fail on a field without validators
+            name = self.formcls.__name__
+            extra = 'if (window.LVTelemetry) LVTelemetry.watch([%s], %r, [%s]);\n%s'%\
+                    (','.join(['LV%s'%lv.element for lv in lvs]),name,
+                     ','.join(['%r'%sign(name,lv.id) for lv in lvs]),extra)
+        if self.collect and can_collect(context):
+            get_collector(context).add(lvs, extra)
+            return ''
+        for lv in lvs:
+            result.append(self.do_field(lv))
+        result.append(extra)
         result.append('</script>')
         return '\n\n'.join(filter(None,result))
         
-    def do_field(self, name, field, count=0):
+    def do_field(self, lv):
+        if self.formcls in LV_VALIDATORS and lv.id[3:] in LV_VALIDATORS[self.formcls]:
+            return str(lv)
+        return """try{
+%s
+}catch(e){}"""%str(lv)
+    
+    def build_field(self, name, field, count=0):
+        """
+        Returns the LiveValidation object for the field or None if it has no validators
+        """
         fname = 'id_%s'%name
         # TODO: make a special case for the split dt field (id_0,id_1)
         #if isinstance(field, fields.SplitDateTimeField):
@@ -56,7 +84,7 @@ class ValidationNode(template.Node):
                 for v,kw in LV_VALIDATORS[self.formcls][name].items():
                     extrakw.update(kw)
                     lv.add(v,**extrakw)
-                return str(lv)
+                return lv if str(lv) else None
         # We have to check for FileFields and ImageFields since if you are changing
         # a form, they will already be set, and you don't need to re-upload them.
         # TODO: Find a way around skipping file and image fields
@@ -78,10 +106,8 @@ class ValidationNode(template.Node):
                 lv.add(v, **extrakw)
                 
         if str(lv):
-            return """try{
-%s
-}catch(e){}"""%str(lv)
-        return ''
+            return lv
+        return None
     
 def live_validate(parser, token):
     """Live Validation JavaScript Generator for Django Forms
@@ -98,6 +124,24 @@ def live_validate(parser, token):
         -  onlyOnBlur = whether you want it to validate as you type or only on blur (DEFAULT: False)
         -  wait = the time you want it to pause from the last keystroke before it validates (milliseconds) (DEFAULT: 0)
         -  onlyOnSubmit = if it is part of a form, whether you want it to validate it only when the form is submitted (DEFAULT: False)
+        -  collect = register the form for {% live_validate_scripts %} instead of rendering it inline (DEFAULT: LV_COLLECT)
     """
     return ValidationNode(*token.split_contents()[1:])
 register.tag(live_validate)
+
+class ScriptsNode(template.Node):
+    def render(self, context):
+        return get_collector(context).render()
+
+def live_validate_scripts(parser, token):
+    """Renders one combined script for every form collected by live_validate
+
+    {% live_validate_scripts %}
+    
+    Place it once near the end of the body, after all of the live_validate tags.
+    Forms are collected when LV_COLLECT is set or the tag is given collect=True.
+    When LiveValidationMiddleware is installed, forms rendered without the request
+    in the context are rendered inline instead
+    """
+    return ScriptsNode()
+register.tag(live_validate_scripts)
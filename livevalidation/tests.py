@@ -1,10 +1,22 @@
 from doctest import testmod
+from time import time
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
 
+from django.conf import settings
 from django.test import TestCase
-from django import template
-from django.contrib.auth.forms import UserChangeForm
+from django import forms, template
+from django.core.context_processors import request as request_processor
+from django.core.cache import cache
+from django.http import Http404, HttpRequest, HttpResponse
+from django.contrib.auth.forms import UserChangeForm, PasswordChangeForm
 
-from livevalidation import validator
+from livevalidation import validator, telemetry, views, settings as lv_settings
+from livevalidation.templatetags import live_validation
+from livevalidation.collector import ValidationCollector, MIDDLEWARE
+from livevalidation.middleware import LiveValidationMiddleware
 
 
 class TestValidation(TestCase):
@@ -22,5 +34,226 @@ class TestValidation(TestCase):
         for text in look_for:        
             self.assert_(content.find(text) >- 1)
         
+    def test_collect(self):
+        t = template.Template('{% load live_validation %}'
+                              '{% live_validate form collect=True %}'
+                              '{% live_validate pwform collect=True %}'
+                              '{% live_validate form collect=True %}'
+                              '{% live_validate_scripts %}')
+        content = t.render(template.Context({'form':UserChangeForm(),'pwform':PasswordChangeForm(None)}))
+        
+        self.assertEqual(content.count('<script'), 1)
+        self.assertEqual(content.count("LVfield('id_username'"), 1)
+        self.assert_(content.find("var LVid_new_password2 = LVfield('id_new_password2'") > -1)
+        self.assertEqual(content.count("[Validate.Presence, { failureMessage: 'Enter a valid value.', validMessage: ' ' }]"), 1)
+        
+    def test_collect_scopes(self):
+        t = template.Template('{% load live_validation %}'
+                              '{% block forms %}{% with form as f %}{% live_validate f collect=True %}{% endwith %}{% endblock %}'
+                              '{% block scripts %}{% live_validate_scripts %}{% endblock %}')
+        content = t.render(template.Context({'form':UserChangeForm()}))
+        
+        self.assertEqual(content.count('<script'), 1)
+        self.assert_(content.find("LVfield('id_username'") > -1)
+        
+    def test_collect_without_request(self):
+        # the middleware can not see forms collected on a plain Context
+        middleware = settings.MIDDLEWARE_CLASSES
+        settings.MIDDLEWARE_CLASSES = tuple(middleware) + (MIDDLEWARE,)
+        try:
+            t = template.Template('{% load live_validation %}{% live_validate form collect=True %}')
+            content = t.render(template.Context({'form':UserChangeForm()}))
+        finally:
+            settings.MIDDLEWARE_CLASSES = middleware
+        
+        self.assert_(content.find("var LVid_username =  new LiveValidation('id_username'") > -1)
+        
+    def test_collect_add_only(self):
+        lv = validator.LiveValidation('id_username').add(validator.Presence).disable()
+        self.assertRaises(ValueError, ValidationCollector().add, [lv])
+        
     def test_validator(self):
         testmod(validator)
+
+
+class TestMiddleware(TestCase):
+    def render(self, body, content_type='text/html; charset=utf-8'):
+        request = HttpRequest()
+        t = template.Template('{% load live_validation %}<html><body>' + body + '</body></html>')
+        context = template.RequestContext(request, {'form':UserChangeForm()}, [request_processor])
+        response = HttpResponse(t.render(context), content_type=content_type)
+        response['Content-Length'] = str(len(response.content))
+        return LiveValidationMiddleware().process_response(request, response)
+    
+    def test_insert(self):
+        response = self.render('{% live_validate form collect=True %}')
+        
+        self.assertEqual(response.content.count('<script'), 1)
+        self.assert_(response.content.endswith('</script></body></html>'))
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        
+    def test_already_rendered(self):
+        response = self.render('{% live_validate form collect=True %}{% live_validate_scripts %}')
+        
+        self.assertEqual(response.content.count('<script'), 1)
+        self.assert_(response.content.endswith('</script></body></html>'))
+        
+    def test_not_html(self):
+        response = self.render('{% live_validate form collect=True %}', 'text/plain')
+        
+        self.assertEqual(response.content, '<html><body></body></html>')
+
+
+class NoteForm(forms.Form):
+    name = forms.CharField(max_length=10)
+    note = forms.CharField(required=False)
+    age = forms.IntegerField()
+
+
+class TestTelemetry(TestCase):
+    urls = 'livevalidation.urls'
+    names = ('LV_TELEMETRY', 'LV_TELEMETRY_CACHE', 'LV_TELEMETRY_FLUSH', 'LV_TELEMETRY_MAX_KEYS')
+    
+    def setUp(self):
+        self.saved = dict([(name, getattr(lv_settings, name)) for name in self.names])
+        lv_settings.LV_TELEMETRY = True
+        lv_settings.LV_TELEMETRY_CACHE = True
+        telemetry.reset()
+        lv_settings.LV_TELEMETRY_CACHE = False
+    
+    def tearDown(self):
+        for name,value in self.saved.items():
+            setattr(lv_settings, name, value)
+    
+    def data(self, f='id_username', v='Format', ok=0, c='UserChangeForm'):
+        return {'c': c, 'f': f, 'v': v, 's': telemetry.sign(c, f), 'ok': ok}
+    
+    def event(self, f='id_username', v='Format', ok=0):
+        return telemetry.clean(self.data(f, v, ok))
+    
+    def post(self, events):
+        return self.client.post('/telemetry/', json.dumps(events), content_type='text/plain')
+    
+    def render(self, form):
+        enabled = live_validation.LV_TELEMETRY
+        live_validation.LV_TELEMETRY = True
+        try:
+            t = template.Template('{% load live_validation %}{% live_validate form %}')
+            return t.render(template.Context({'form':form}))
+        finally:
+            live_validation.LV_TELEMETRY = enabled
+    
+    def test_view(self):
+        response = self.post([self.data(), self.data(), self.data(v='', ok=1)])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(telemetry.get_counts(), {
+            ('UserChangeForm', 'id_username', 'Format'): [2, 0],
+            ('UserChangeForm', 'id_username', ''): [0, 1],
+        })
+        
+    def test_unicode(self):
+        response = self.post([self.data(f=u'id_\u00fcser', v='', ok=1)])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(telemetry.get_counts(), {('UserChangeForm', 'id_\xc3\xbcser', ''): [0, 1]})
+        
+    def test_disabled(self):
+        lv_settings.LV_TELEMETRY = False
+        request = HttpRequest()
+        request.method = 'POST'
+        self.assertRaises(Http404, views.telemetry_view, request)
+        
+    def test_bad_request(self):
+        forged = self.data()
+        forged['f'] = 'id_password'
+        for events in ([{'c': 'UserChangeForm'}],
+                       self.data(),
+                       [self.data(v='Bogus')],
+                       [self.data(f='x'*101)],
+                       [self.data(c='x'*101)],
+                       [self.data(ok=2)],
+                       [dict(self.data(), c=1)],
+                       [forged]):
+            self.assertEqual(self.post(events).status_code, 400)
+        self.assertEqual(telemetry.get_counts(), {})
+        
+    def test_max_keys(self):
+        lv_settings.LV_TELEMETRY_MAX_KEYS = 2
+        for f in ('id_a', 'id_b', 'id_c', 'id_a'):
+            telemetry.record([self.event(f)])
+        self.assertEqual(telemetry.get_counts(), {
+            ('UserChangeForm', 'id_a', 'Format'): [2, 0],
+            ('UserChangeForm', 'id_b', 'Format'): [1, 0],
+        })
+        
+    def test_max_keys_cache(self):
+        lv_settings.LV_TELEMETRY_CACHE = True
+        lv_settings.LV_TELEMETRY_FLUSH = 0
+        lv_settings.LV_TELEMETRY_MAX_KEYS = 2
+        for f in ('id_a', 'id_b', 'id_c', 'id_a'):
+            telemetry.record([self.event(f)])
+        self.assertEqual(telemetry.get_counts(), {
+            ('UserChangeForm', 'id_a', 'Format'): [2, 0],
+            ('UserChangeForm', 'id_b', 'Format'): [1, 0],
+        })
+        
+    def test_cache(self):
+        key = ('UserChangeForm', 'id_username', 'Format')
+        lv_settings.LV_TELEMETRY_CACHE = True
+        lv_settings.LV_TELEMETRY_FLUSH = 3600
+        telemetry._last_flush[0] = time()
+        telemetry.record([self.event()])
+        self.assertEqual(telemetry._cached_counts(), {})
+        self.assertEqual(telemetry.get_counts(), {key: [1, 0]})
+        
+        lv_settings.LV_TELEMETRY_FLUSH = 0
+        telemetry.record([self.event(), self.event(ok=1)])
+        self.assertEqual(telemetry._counts, {})
+        self.assertEqual(telemetry._cached_counts(), {key: [2, 1]})
+        self.assertEqual(telemetry.get_counts(), {key: [2, 1]})
+        
+        lv_settings.LV_TELEMETRY_FLUSH = 3600
+        telemetry.record([self.event()])
+        self.assertEqual(telemetry.get_counts(), {key: [3, 1]})
+        
+        telemetry.reset()
+        self.assertEqual(telemetry._cached_counts(), {})
+        self.assertEqual(telemetry.get_counts(), {})
+        
+    def test_index_expired(self):
+        key = ('UserChangeForm', 'id_username', 'Format')
+        lv_settings.LV_TELEMETRY_CACHE = True
+        lv_settings.LV_TELEMETRY_FLUSH = 0
+        telemetry.record([self.event()])
+        # the slots expire before the counters
+        cache.delete_many(telemetry._slots())
+        self.assertEqual(telemetry.get_counts(), {})
+        
+        telemetry.record([self.event()])
+        self.assertEqual(telemetry.get_counts(), {key: [2, 0]})
+        
+    def test_counter_evicted(self):
+        key = ('UserChangeForm', 'id_username', 'Format')
+        lv_settings.LV_TELEMETRY_CACHE = True
+        lv_settings.LV_TELEMETRY_FLUSH = 0
+        telemetry.record([self.event()])
+        cache.delete(telemetry._counter(key, 'failed'))
+        
+        telemetry.record([self.event()])
+        self.assertEqual(telemetry.get_counts(), {key: [1, 0]})
+        
+    def test_watch(self):
+        content = self.render(UserChangeForm())
+        
+        self.assert_(content.find("if (window.LVTelemetry) LVTelemetry.watch([LVid_") > -1)
+        self.assert_(content.find("LVid_username,") > -1)
+        self.assert_(content.find("], 'UserChangeForm', [") > -1)
+        self.assert_(content.find("'%s'"%telemetry.sign('UserChangeForm', 'id_username')) > -1)
+        
+    def test_watch_before_extra(self):
+        # LV_EXTRA_SCRIPT uses the second field, which has no validators here
+        content = self.render(NoteForm())
+        
+        self.assert_(-1 < content.find('LVTelemetry.watch([LVid_name,LVid_age]') < content.find('LVid_note.form.onsubmit'))
+        
+    def test_telemetry(self):
+        testmod(telemetry)
@@ -0,0 +1,5 @@
+from django.conf.urls.defaults import *
+
+urlpatterns = patterns('livevalidation.views',
+    url(r'^telemetry/$', 'telemetry_view', name='livevalidation_telemetry'),
+)
@@ -264,15 +264,20 @@ class LiveValidation:
         """
     def __init__(self,element,**kw):
         self.element = element.replace('-', '_')
-        self.commands = ["var LV%s =  new LiveValidation('%s', { %s });"%\
-                         (self.element,element,','.join(inner(kw.items())))]
+        self.id = element
+        self.options = '{ %s }'%','.join(inner(kw.items()))
+        self.validators = []
+        self.commands = ["var LV%s =  new LiveValidation('%s', %s);"%\
+                         (self.element,element,self.options)]
         
     def add(self, validator, **kw):
         """
         Validates a passed in value using the passed in validation function,
         and handles the validation error for you so it gives a nice true or false reply.
         """
-        self._format('add',validator(**kw))
+        v = validator(**kw)
+        self.validators.append(str(v))
+        self._format('add',v)
         return self
     
     def extend(self, item):
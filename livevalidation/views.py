@@ -0,0 +1,29 @@
+try:
+    import json
+except ImportError:
+    from django.utils import simplejson as json
+
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from django.views.decorators.csrf import csrf_exempt
+
+from livevalidation import settings, telemetry
+
+@csrf_exempt
+def telemetry_view(request):
+    """
+    Receives the batched events posted by livevalidation_telemetry.js.
+    It is exempt from CSRF since navigator.sendBeacon cannot send the token
+    """
+    if not settings.LV_TELEMETRY:
+        raise Http404
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        events = json.loads(request.raw_post_data)
+        if not isinstance(events, list):
+            raise TypeError('Expected a list of events')
+        events = map(telemetry.clean, events[:settings.LV_TELEMETRY_BATCH])
+    except (ValueError, TypeError, KeyError):
+        return HttpResponseBadRequest()
+    telemetry.record(events)
+    return HttpResponse(status=204)